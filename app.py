@@ -1,9 +1,7 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
 import numpy as np
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 # --- 페이지 설정 ---
 st.set_page_config(page_title="고배당 마스터 시뮬레이터 (Pro)", layout="wide")
@@ -23,22 +21,80 @@ st.title("💸 고배당 마스터 시뮬레이터 (Pro)")
 st.markdown("배당 주기를 **자유롭게 변경**하여 미래 수익을 예측해보세요.")
 
 # --- 데이터 로딩 및 분석 함수 ---
-@st.cache_data
+# Ticker 객체(세션·쿠키 포함)는 서버 전체에서 재사용 (스크립트 재실행 시에도 유지)
+@st.cache_resource(show_spinner=False)
+def get_ticker(symbol):
+    import yfinance_cache as yfc # 무거운 라이브러리는 실제 조회 시점에 로드
+    return yfc.Ticker(symbol)
+
+# 1시간마다 갱신, 최근 조회한 64개 (티커, 기간) 조합만 보관 (스피너는 메인 로직에서 표시)
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
 def get_market_analysis(ticker, period_years):
-    stock = yf.Ticker(ticker)
+    history, is_data_short = fetch_history(ticker, period_years)
+    return analyze_history(history, period_years, is_data_short)
+
+# --- 시세 조회 (배당 1년 합계용으로 최소 2년치) ---
+def fetch_history(ticker, period_years):
+    # yfinance-cache: 디스크에 저장된 시세를 재사용하고 오래된 구간만 새로 받아옴
+    stock = get_ticker(ticker)
     
     # 1. 주식 데이터 (기간 연동)
-    period_str = f"{period_years}y"
+    # 기간이 1년이어도 직전 1년 배당이 시세 시작 전으로 잘리지 않도록 최소 2년치 조회
+    period_str = f"{max(period_years, 2)}y"
     history = stock.history(period=period_str)
     
     is_data_short = False
-    actual_years = 0
     
     if history.empty:
         # 데이터가 아예 없으면 max로 재시도
         history = stock.history(period="max")
         is_data_short = True
-    
+
+    return history, is_data_short
+
+# --- 다종목 일괄 조회 (비교용) ---
+@st.cache_data(ttl=3600, max_entries=16, show_spinner=False)
+def get_bulk_history(tickers_tuple, period_years):
+    # 종목별 조회를 작업 스레드로 겹쳐 실행 (Ticker 객체는 get_ticker로 공유)
+    # yfc.download(threads=True)는 서버 프로세스를 fork하는 멀티프로세싱이라 사용하지 않음
+    with ThreadPoolExecutor(max_workers=min(len(tickers_tuple), 4)) as executor:
+        futures = {t: executor.submit(fetch_history, t, period_years) for t in tickers_tuple}
+        bulk = {}
+        for t, future in futures.items():
+            try:
+                bulk[t] = future.result()[0]
+            except:
+                bulk[t] = pd.DataFrame() # 조회 실패 종목은 비교표에서 제외
+        return bulk
+
+# 종가 Series는 전체를 해싱하지 않고 기간·길이·양끝 값으로만 식별 (O(1))
+# 주의: 호출 후 원본 Series를 수정하면 캐시와 어긋나므로 수정하지 말 것
+def _close_series_key(close_series):
+    if len(close_series) == 0:
+        return 0
+    return (len(close_series), close_series.index[0].value, close_series.index[-1].value,
+            float(close_series.iloc[0]), float(close_series.iloc[-1]))
+
+# --- 월평균 등락률 계산 ---
+@st.cache_data(max_entries=128, show_spinner=False, hash_funcs={pd.Series: _close_series_key})
+def compute_trend(close_series):
+    # 월말 종가: 현지 시각 기준 월이 바뀌기 직전 행 (index는 시간순 정렬)
+    closes = close_series.to_numpy()
+    months_key = close_series.index.tz_localize(None).values.astype('datetime64[M]')
+    _, month_start = np.unique(months_key, return_index=True)
+    month_end = np.append(month_start[1:] - 1, len(closes) - 1)
+    monthly_prices = closes[month_end]
+    return np.mean(np.diff(monthly_prices) / monthly_prices[:-1]) * 100
+
+# --- 시세 데이터 분석 (단일 조회/일괄 조회 공용) ---
+def analyze_history(history, period_years, is_data_short=False):
+    actual_years = 0
+
+    # 배당은 받은 전체 구간에서, 주가 추세는 설정 기간만 잘라서 분석
+    dividend_history = history
+    if not history.empty:
+        history = history[history.index >= history.index[-1] - pd.DateOffset(years=period_years)]
+
     if not history.empty:
         days_diff = (history.index[-1] - history.index[0]).days
         actual_years = days_diff / 365
@@ -51,46 +107,258 @@ def get_market_analysis(ticker, period_years):
 
     # 월간 수익률(CAGR) 계산
     if not history.empty:
-        monthly_prices = history['Close'].resample('ME').last()
-        monthly_returns = monthly_prices.pct_change().dropna()
-        avg_monthly_change = monthly_returns.mean() * 100
+        avg_monthly_change = compute_trend(history['Close'])
     else:
         avg_monthly_change = 0
 
     # 2. 배당 데이터 (최근 1년치 합계 계산 - 연배당률 산정용)
-    dividends = stock.dividends
+    # 시세 데이터의 Dividends 컬럼에서 지급일만 추출 (별도 요청 없음)
+    if "Dividends" in dividend_history.columns:
+        dividends = dividend_history["Dividends"][dividend_history["Dividends"] != 0]
+    else:
+        dividends = pd.Series(dtype=float)
     
     # Timezone 제거 및 최근 1년 데이터 필터링
     if len(dividends) > 0:
-        dividends.index = dividends.index.tz_convert(None)
-        last_date = dividends.index[-1]
-        one_year_ago = last_date - timedelta(days=365)
-        last_1y_dividends = dividends[dividends.index >= one_year_ago]
+        if dividends.index.tz is not None:
+            dividends.index = dividends.index.tz_convert(None)
+        # 시간순 정렬된 datetime64 배열에서 1년 전 시점을 이분 탐색
+        div_dates = dividends.index.values
+        div_values = dividends.to_numpy()
+        one_year_ago = div_dates[-1] - np.timedelta64(365, 'D')
+        start = np.searchsorted(div_dates, one_year_ago)
         
         # 최근 1년간 지급된 배당금 총합 (연 배당금)
-        annual_div_sum = last_1y_dividends.sum()
+        annual_div_sum = div_values[start:].sum()
         
         # 만약 최근 1년 데이터가 없다면 전체 평균 * 12 (예외처리)
-        if annual_div_sum == 0 and len(dividends) > 0:
-             annual_div_sum = dividends.mean() * 12
+        if annual_div_sum == 0:
+             annual_div_sum = div_values.mean() * 12
     else:
         annual_div_sum = 0
         
-    recent_div_display = dividends.tail(12).sort_index(ascending=False)
+    # 시세 index가 시간순이므로 정렬 없이 뒤집어서 최신순 표시
+    recent_div_display = dividends.tail(12).iloc[::-1]
+
+    # 차트 표시에는 종가만 필요 (float32로 캐시·전송 크기 절반)
+    history_close = history.get('Close', pd.Series(dtype=float)).astype('float32')
+
+    return current_price_usd, annual_div_sum, avg_monthly_change, is_data_short, actual_years, history_close, recent_div_display
+
+# --- 환율 조회 (1시간 캐시, 모든 티커·세션이 공유) ---
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_fx_rate(pair="KRW=X"):
+    return get_ticker(pair).history(period="1d")['Close'].iloc[-1]
+
+# --- 수익 예측 시뮬레이션 (NumPy 닫힌 형태, 월별 루프 없음) ---
+def _simulate(months, price, div, tax, r, init, contrib, is_weekly, interval):
+    net_div_per_share = div * (1 - tax/100)
+
+    # 월별 주가 경로 (0개월차 ~ months개월차)
+    prices = price * np.power(1 + r/100, np.arange(months + 1))
+
+    # --- 배당 지급 월 (주기 반영, pay_mask[i] = i개월차 지급 여부) ---
+    # 주배당: 월 단위 근사치로 매달 지급 / 월·분기·반기·연: 주기의 배수 월에만 지급 (예: 분기면 3, 6, 9월...)
+    pay_mask = np.zeros(months + 1, dtype=np.float64)
+    if is_weekly:
+        pay_mask[1:] = 1.0
+    else:
+        pay_mask[interval::interval] = 1.0
+
+    # --- 배당 재투자 점화식의 닫힌 형태 ---
+    # shares[i] = shares[i-1] * growth[i] + contrib_shares[i]
+    # => shares[i] = forward[i] * (shares[0] + Σ_{k<=i} contrib_shares[k] / forward[k])
+    growth = 1 + net_div_per_share * pay_mask[1:] / prices[1:]
+    contrib_shares = contrib / prices[1:]
+    forward = np.concatenate((np.ones(1), np.cumprod(growth)))
+    shares = forward * (init / price + np.concatenate((np.zeros(1), np.cumsum(contrib_shares / forward[1:]))))
+
+    invested = init + contrib * np.arange(months + 1)
+    accumulated = np.cumsum(shares[:-1] * net_div_per_share * pay_mask[1:])
+
+    # 멘징 체크: i개월차 누적 배당이 그 달 적립 전 원금 이상이 되는 첫 시점 (미달성 시 -1)
+    reached = accumulated >= invested[:-1]
+    break_even = np.argmax(reached) + 1 if reached.any() else -1
+
+    return shares * prices, invested, accumulated[-1], break_even
+
+# 같은 입력이면 재실행 시 계산을 건너뜀 (원시 타입 인자만 사용)
+@st.cache_data(max_entries=128, show_spinner=False)
+def run_simulation(price_krw, div_krw, tax_rate, real_change_rate, initial_invest_krw, monthly_contrib_krw, months, interval, is_weekly_mode):
+    asset_arr, invested_arr, accumulated_div, break_even = _simulate(
+        months, float(price_krw), float(div_krw), float(tax_rate), float(real_change_rate),
+        float(initial_invest_krw), float(monthly_contrib_krw), is_weekly_mode, interval,
+    )
+    break_even_month = int(break_even) if break_even > 0 else None
+
+    # 연속 버퍼 그대로 전달 (Plotly가 ndarray를 직접 사용)
+    # 원 단위 절사만 하고 float64 유지: 정수 변환 시 큰 값에서 오버플로로 값이 뒤집힘
+    data_asset = np.trunc(asset_arr)
+    data_invested = invested_arr
+    data_labels = ["시작"] + [f"{i}개월" for i in range(1, months + 1)]
+    return data_asset, data_invested, data_labels, float(accumulated_div), break_even_month
+
+# 시뮬레이션 결과가 같으면 그래프 객체도 재사용 (ndarray는 Streamlit이 바이트 단위로 해싱)
+# cache_data는 매번 unpickle한 복사본을 돌려줘 새로 그리는 것보다 느리므로 객체 자체를 공유
+# (반환된 Figure는 st.plotly_chart에 넘기기만 하고 수정하지 않음)
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_fig(data_asset, data_invested, data_labels):
+    import plotly.graph_objects as go # 그래프를 그릴 때만 로드
+    # WebGL 렌더링
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=data_labels, y=data_asset, mode='lines', name='평가 자산', fill='tozeroy', line=dict(color='#6366f1', width=3)))
+    fig.add_trace(go.Scattergl(x=data_labels, y=data_invested, mode='lines', name='투입 원금', line=dict(color='#9ca3af', dash='dot')))
+    fig.update_layout(height=400, margin=dict(l=20, r=20, t=20, b=20), hovermode="x unified")
+    return fig
+
+# --- 목표 금액 역산 (배당이 0 이하로 예측되면 None) ---
+@st.cache_data(max_entries=128, show_spinner=False)
+def compute_plan(price_krw, annual_div_krw, tax_rate, real_change_rate, years, target_monthly_div):
+    future_months = years * 12
+    
+    # 미래 주가 및 배당 예측 (월 추세 반영)
+    decay_factor = (1 + real_change_rate/100) ** future_months
+    est_future_price = price_krw * decay_factor
+    
+    # 미래의 '연간' 배당금 예측 (주당)
+    est_future_annual_dps = annual_div_krw * decay_factor
+    
+    # 목표 금액 (월 * 12 = 연간 목표 배당금)
+    target_annual_div_won = target_monthly_div * 10000 * 12
+    
+    if est_future_annual_dps <= 0:
+        return None
+
+    # 필요 주식 수 = 연간 목표 배당금 / (미래의 주당 연배당금 * 세후)
+    needed_shares = target_annual_div_won / (est_future_annual_dps * (1 - tax_rate/100))
+    needed_asset_future = needed_shares * est_future_price
+    
+    # 월 수익률 계산 (Total Return)
+    # 월 환산 배당수익률
+    monthly_yield_rate = (annual_div_krw / 12) / price_krw * 100
+    total_monthly_return_rate = (real_change_rate + monthly_yield_rate) / 100
+    
+    # 적립액 계산 (연금 미래가치 역산 공식)
+    if total_monthly_return_rate == 0:
+        monthly_savings_needed = needed_asset_future / future_months
+    else:
+        monthly_savings_needed = needed_asset_future * total_monthly_return_rate / ((1 + total_monthly_return_rate)**future_months - 1)
+    return float(needed_asset_future), float(monthly_savings_needed)
+
+# --- TAB 1: 수익 예측 시뮬레이션 (위젯 변경 시 이 영역만 재실행) ---
+@st.fragment
+def render_tab1(div_freq_option, selected_freq, is_weekly_mode, price_krw, div_per_payout_krw, tax_rate, real_change_rate, years):
+    st.subheader(f"💰 {div_freq_option} 기준 시뮬레이션")
+    c1, c2 = st.columns(2)
+    initial_invest_input = c1.number_input("초기 투자금 (만원)", value=1000, step=100, key="sim_init")
+    monthly_contrib_input = c2.number_input("매달 추가 납입 (만원)", value=50, step=10, key="sim_monthly")
+    
+    initial_invest_krw = initial_invest_input * 10000
+    monthly_contrib_krw = monthly_contrib_input * 10000
+    
+    # 버튼을 한 번 누르면 이후 재실행에서도 (캐시된) 결과를 계속 표시
+    if st.button("🚀 수익률 예측하기", type="primary"):
+        st.session_state["sim_ran"] = True
+
+    if st.session_state.get("sim_ran"):
+        # 버튼 상태가 유지되므로, 주가 데이터가 없는 티커로 바뀌어도 계산하지 않도록 차단
+        if price_krw <= 0:
+            st.warning("⚠️ 현재 주가 데이터가 없어 시뮬레이션할 수 없습니다. 티커를 확인하세요.")
+            return
+
+        data_asset, data_invested, data_labels, accumulated_div, break_even_month = run_simulation(
+            price_krw, div_per_payout_krw, tax_rate, real_change_rate,
+            initial_invest_krw, monthly_contrib_krw, years * 12, selected_freq["interval"], is_weekly_mode,
+        )
 
-    # 3. 환율 데이터
-    try:
-        exchange = yf.Ticker("KRW=X")
-        exchange_rate = exchange.history(period="1d")['Close'].iloc[-1]
-    except:
-        exchange_rate = 1300.0 # 예외 시 기본값
+        # 그래프
+        fig = build_fig(data_asset, data_invested, tuple(data_labels))
+        st.plotly_chart(fig, use_container_width=True)
 
-    return current_price_usd, annual_div_sum, exchange_rate, avg_monthly_change, is_data_short, actual_years, history, recent_div_display
+        # 결과 계산
+        final_asset = data_asset[-1]
+        final_invested = data_invested[-1]
+        total_profit = final_asset - final_invested
+        roi = (total_profit / final_invested) * 100
+        price_impact = total_profit - accumulated_div
+
+        # 1. 핵심 요약 카드
+        rc1, rc2, rc3 = st.columns(3)
+        with rc1:
+            st.markdown(f"""<div class="highlight-box"><div style="color:gray;">총 투입 원금</div><div style="font-size:1.5rem; font-weight:bold;">{final_invested/10000:,.0f} 만원</div></div>""", unsafe_allow_html=True)
+        with rc2:
+            color = "#ef4444" if total_profit < 0 else "#22c55e"
+            st.markdown(f"""<div class="highlight-box" style="border-left-color:{color};"><div style="color:gray;">최종 평가 자산</div><div style="font-size:1.5rem; font-weight:bold; color:{color};">{final_asset/10000:,.0f} 만원</div></div>""", unsafe_allow_html=True)
+        with rc3:
+            st.markdown(f"""<div class="highlight-box" style="border-left-color:#3b82f6;"><div style="color:gray;">최종 수익률</div><div style="font-size:1.5rem; font-weight:bold; color:#3b82f6;">{roi:+.2f}%</div></div>""", unsafe_allow_html=True)
+
+        st.write("")
+
+        # 2. 상세 분석 섹션
+        st.info(f"🔍 **수익 상세 ({div_freq_option} 기준)**")
+        d1, d2 = st.columns(2)
+        with d1:
+            st.metric(label="💰 기간 내 받은 총 배당금 (세후)", value=f"{accumulated_div:,.0f} 원", help="재투자된 금액 포함")
+        with d2:
+            p_color = "inverse" if price_impact > 0 else "normal"
+            st.metric(label="📉 주가 변동 손익", value=f"{price_impact:,.0f} 원", delta_color=p_color)
+
+        # 3. 멘징 메시지
+        if break_even_month:
+            st.success(f"🎉 **원금 회수(Free Ride) 달성!**\n투자 시작 후 **{break_even_month}개월** 만에 배당금 누적액이 내 원금을 넘어섰습니다.")
+        else:
+            st.warning(f"⚠️ **원금 회수 미달성**\n{years}년 동안 배당금이 원금 증가 속도를 따라잡지 못했습니다.")
+
+# --- TAB 2: 목표 계산 (위젯 변경 시 이 영역만 재실행) ---
+@st.fragment
+def render_tab2(div_freq_option, selected_freq, price_krw, annual_div_krw, tax_rate, real_change_rate, years):
+    st.subheader("🎯 목표를 달성하려면 얼마가 필요할까?")
+    st.markdown(f"설정한 **{years}년 뒤**에 원하는 **월 평균 수령액**을 받기 위한 플랜입니다.")
+    
+    target_monthly_div_input = st.number_input("목표 월 배당금 (만원)", value=100, step=10, help="세후 기준으로 매달(혹은 월 환산으로) 받고 싶은 금액")
+    
+    if st.button("🧮 필요 자금 및 월 적립액 계산", type="primary"):
+        st.session_state["plan_ran"] = True
+
+    if st.session_state.get("plan_ran"):
+        if price_krw <= 0:
+            st.warning("⚠️ 현재 주가 데이터가 없어 계산할 수 없습니다. 티커를 확인하세요.")
+            return
+
+        plan = compute_plan(price_krw, annual_div_krw, tax_rate, real_change_rate, years, target_monthly_div_input)
+        
+        if plan is None:
+             st.error("⚠️ 예상 배당금이 0원이 되어 계산할 수 없습니다. 주가 하락률을 조정하세요.")
+        else:
+            needed_asset_future, monthly_savings_needed = plan
+            
+            st.divider()
+            st.markdown(f"""
+            <div style="text-align: center; padding: 25px; background-color: #f0f7ff; border-radius: 15px; border: 2px solid #3b82f6; margin-bottom: 20px;">
+                <div style="color: #6b7280; font-size: 1.1rem; margin-bottom: 5px;">{years}년 뒤, 월 {target_monthly_div_input}만원(연 {target_monthly_div_input*12:,}만원)을 받으려면</div>
+                <div style="color: #1d4ed8; font-size: 2.5rem; font-weight: bold;">{needed_asset_future/10000:,.0f} 만원</div>
+                <div style="color: #6b7280; font-size: 0.9rem;">만큼의 계좌 잔고(평가금)가 있어야 합니다.</div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.markdown(f"""
+            <div style="text-align: center; padding: 25px; background-color: #fff1f2; border-radius: 15px; border: 2px solid #e11d48;">
+                <div style="color: #6b7280; font-size: 1.1rem; margin-bottom: 5px;">🔥 당장 이번 달부터</div>
+                <div style="color: #be123c; font-size: 2.5rem; font-weight: bold;">월 {monthly_savings_needed/10000:,.0f} 만원씩</div>
+                <div style="color: #6b7280; font-size: 0.9rem;">종목을 매수하고 배당을 재투자해야 합니다.</div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            with st.expander("📌 참고: 배당 주기에 따른 실제 수령액"):
+                per_payout_target = (target_monthly_div_input * 12) / selected_freq["count"]
+                st.write(f"현재 **{div_freq_option}** 설정을 기준으로 하면, 목표 달성 시")
+                st.write(f"**{selected_freq['desc']}** 때마다 **약 {per_payout_target:,.0f} 만원 (세후)** 씩 입금됩니다.")
 
 # --- 사이드바: 설정 ---
 with st.sidebar:
     st.header("1. 종목 설정")
     ticker_symbol = st.text_input("티커 (Ticker)", value="TSLY")
+    compare_tickers = st.multiselect("비교 종목 (일괄 조회)", ["TSLY", "JEPI", "JEPQ", "SCHD", "QYLD", "NVDY", "CONY"])
     
     st.divider()
     st.header("2. 배당 주기 설정")
@@ -114,7 +382,10 @@ with st.sidebar:
     st.caption(f"ℹ️ {div_freq_option}: {selected_freq['desc']}")
 
     if st.button("🔄 데이터/추세 새로고침"):
-        st.cache_data.clear()
+        # 시세는 yfinance-cache가 만료된 구간만 갱신하므로 분석 결과와 환율만 비움
+        get_market_analysis.clear()
+        get_bulk_history.clear()
+        get_fx_rate.clear()
 
     st.divider()
     
@@ -126,7 +397,14 @@ with st.sidebar:
 try:
     with st.spinner(f"{ticker_symbol} 데이터를 분석 중입니다..."):
         # 함수에서 annual_div_sum(연간 총 배당금)을 받아옵니다.
-        price_usd, annual_div_usd, rate, calculated_change_rate, is_short, real_years, history_df, div_df = get_market_analysis(ticker_symbol, years)
+        # 환율 조회를 작업 스레드로 보내 시세 조회와 네트워크 대기 시간을 겹침
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fx_future = executor.submit(get_fx_rate)
+            price_usd, annual_div_usd, calculated_change_rate, is_short, real_years, history_close, div_df = get_market_analysis(ticker_symbol, years)
+            try:
+                rate = fx_future.result()
+            except:
+                rate = 1300.0 # 예외 시 기본값
 
     price_krw = price_usd * rate
     
@@ -153,8 +431,9 @@ try:
         emoji = "📈" if calculated_change_rate > 0 else "📉"
         real_change_rate = st.number_input(
             f"{emoji} 월평균 등락률 (자동)", 
-            value=float(f"{calculated_change_rate:.2f}"), 
-            step=0.1, format="%.2f"
+            value=max(float(f"{calculated_change_rate:.2f}"), -99.0), 
+            min_value=-99.0, step=0.1, format="%.2f",
+            help="-100% 이하는 주가가 0이 되어 계산할 수 없습니다."
         )
         st.caption("이 값을 조정하면 시뮬레이션에 반영됩니다.")
 
@@ -173,12 +452,36 @@ try:
     with st.expander("📊 데이터 산출 근거 상세 보기 (클릭)", expanded=False):
         tab_ev1, tab_ev2 = st.tabs(["📉 주가 추세 근거", "💰 배당금 내역"])
         with tab_ev1:
-            st.line_chart(history_df['Close'])
+            st.line_chart(history_close)
             st.caption(f"최근 {years}년 주가 흐름을 분석하여 월평균 변동률 {real_change_rate:.2f}%를 도출했습니다.")
         with tab_ev2:
-            st.dataframe(div_df, use_container_width=True)
+            st.table(div_df.to_frame(name='배당(USD)'))
             st.caption(f"* 최근 1년 총 배당금 합계(USD): ${annual_div_usd:.2f}")
 
+    # 비교 종목: 동시에 받은 종목별 시세에 같은 분석 로직 적용
+    # 부가 정보이므로 여기서 난 오류가 메인 티커 화면(아래 탭)을 막지 않도록 따로 처리
+    if compare_tickers:
+        with st.expander("🔀 비교 종목 요약", expanded=False):
+            try:
+                bulk = get_bulk_history(tuple(compare_tickers), years)
+                compare_rows = []
+                for t in compare_tickers:
+                    if bulk[t].empty:
+                        continue
+                    t_price_usd, t_annual_div, t_change_rate, _, _, _, _ = analyze_history(bulk[t], years)
+                    compare_rows.append({
+                        "티커": t,
+                        "현재 주가(원)": round(t_price_usd * rate),
+                        "연 배당률(%)": round(t_annual_div / t_price_usd * 100, 1) if t_price_usd > 0 else 0,
+                        "월평균 등락률(%)": round(t_change_rate, 2),
+                    })
+                if compare_rows:
+                    st.dataframe(pd.DataFrame(compare_rows).set_index("티커"), width="stretch")
+                else:
+                    st.info("비교할 수 있는 종목 데이터가 없습니다.")
+            except Exception as e:
+                st.warning(f"⚠️ 비교 종목을 불러오지 못했습니다: {e}")
+
     st.write("") 
 
     # 탭 구성
@@ -188,172 +491,13 @@ try:
     # TAB 1: 수익 예측 시뮬레이션
     # ==============================================================================
     with tab1:
-        st.subheader(f"💰 {div_freq_option} 기준 시뮬레이션")
-        c1, c2 = st.columns(2)
-        initial_invest_input = c1.number_input("초기 투자금 (만원)", value=1000, step=100, key="sim_init")
-        monthly_contrib_input = c2.number_input("매달 추가 납입 (만원)", value=50, step=10, key="sim_monthly")
-        
-        initial_invest_krw = initial_invest_input * 10000
-        monthly_contrib_krw = monthly_contrib_input * 10000
-        
-        if st.button("🚀 수익률 예측하기", type="primary"):
-            months = years * 12
-            current_shares = initial_invest_krw / price_krw
-            current_price = price_krw
-            total_invested = initial_invest_krw 
-            accumulated_div = 0 
-            
-            data_asset = []    
-            data_invested = [] 
-            data_labels = []
-            break_even_month = None
-
-            # 시뮬레이션 루프 (월 단위)
-            for i in range(months + 1):
-                # 0개월차 초기값 세팅
-                if i == 0:
-                    data_asset.append(int(current_shares * current_price))
-                    data_invested.append(total_invested)
-                    data_labels.append("시작")
-                    continue
-                
-                # --- 배당 지급 로직 (주기 반영) ---
-                gross_div = 0
-                
-                if is_weekly_mode:
-                    # 주배당: 월 단위 근사치로 매달 지급 (연배당/12)
-                    gross_div = current_shares * div_per_payout_krw
-                else:
-                    # 월/분기/반기/연: 해당 주기에만 지급
-                    interval = selected_freq["interval"]
-                    # 현재 월(i)이 주기의 배수일 때 지급 (예: 분기면 3, 6, 9월...)
-                    if i % interval == 0:
-                        gross_div = current_shares * div_per_payout_krw
-                
-                net_div = gross_div * (1 - tax_rate/100)
-                accumulated_div += net_div
-
-                # 멘징 체크
-                if break_even_month is None and accumulated_div >= total_invested:
-                    break_even_month = i
-
-                # --- 자산 변동 및 재투자 ---
-                current_price = current_price * (1 + real_change_rate/100)
-                
-                # 매수 자금 = (받은 배당금) + (월 적립금)
-                buy_amount = net_div + monthly_contrib_krw
-                new_shares = buy_amount / current_price
-                current_shares += new_shares
-                total_invested += monthly_contrib_krw
-                
-                asset_value = int(current_shares * current_price)
-                data_asset.append(asset_value)
-                data_invested.append(total_invested)
-                data_labels.append(f"{i}개월")
-
-            # 그래프
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=data_labels, y=data_asset, mode='lines', name='평가 자산', fill='tozeroy', line=dict(color='#6366f1', width=3)))
-            fig.add_trace(go.Scatter(x=data_labels, y=data_invested, mode='lines', name='투입 원금', line=dict(color='#9ca3af', dash='dot')))
-            fig.update_layout(height=400, margin=dict(l=20, r=20, t=20, b=20), hovermode="x unified")
-            st.plotly_chart(fig, use_container_width=True)
-
-            # 결과 계산
-            final_asset = data_asset[-1]
-            final_invested = data_invested[-1]
-            total_profit = final_asset - final_invested
-            roi = (total_profit / final_invested) * 100
-            price_impact = total_profit - accumulated_div
-
-            # 1. 핵심 요약 카드
-            rc1, rc2, rc3 = st.columns(3)
-            with rc1:
-                st.markdown(f"""<div class="highlight-box"><div style="color:gray;">총 투입 원금</div><div style="font-size:1.5rem; font-weight:bold;">{final_invested/10000:,.0f} 만원</div></div>""", unsafe_allow_html=True)
-            with rc2:
-                color = "#ef4444" if total_profit < 0 else "#22c55e"
-                st.markdown(f"""<div class="highlight-box" style="border-left-color:{color};"><div style="color:gray;">최종 평가 자산</div><div style="font-size:1.5rem; font-weight:bold; color:{color};">{final_asset/10000:,.0f} 만원</div></div>""", unsafe_allow_html=True)
-            with rc3:
-                st.markdown(f"""<div class="highlight-box" style="border-left-color:#3b82f6;"><div style="color:gray;">최종 수익률</div><div style="font-size:1.5rem; font-weight:bold; color:#3b82f6;">{roi:+.2f}%</div></div>""", unsafe_allow_html=True)
-
-            st.write("")
-
-            # 2. 상세 분석 섹션
-            st.info(f"🔍 **수익 상세 ({div_freq_option} 기준)**")
-            d1, d2 = st.columns(2)
-            with d1:
-                st.metric(label="💰 기간 내 받은 총 배당금 (세후)", value=f"{accumulated_div:,.0f} 원", help="재투자된 금액 포함")
-            with d2:
-                p_color = "inverse" if price_impact > 0 else "normal"
-                st.metric(label="📉 주가 변동 손익", value=f"{price_impact:,.0f} 원", delta_color=p_color)
-
-            # 3. 멘징 메시지
-            if break_even_month:
-                st.success(f"🎉 **원금 회수(Free Ride) 달성!**\n투자 시작 후 **{break_even_month}개월** 만에 배당금 누적액이 내 원금을 넘어섰습니다.")
-            else:
-                st.warning(f"⚠️ **원금 회수 미달성**\n{years}년 동안 배당금이 원금 증가 속도를 따라잡지 못했습니다.")
+        render_tab1(div_freq_option, selected_freq, is_weekly_mode, price_krw, div_per_payout_krw, tax_rate, real_change_rate, years)
 
     # ==============================================================================
     # TAB 2: 목표 계산
     # ==============================================================================
     with tab2:
-        st.subheader("🎯 목표를 달성하려면 얼마가 필요할까?")
-        st.markdown(f"설정한 **{years}년 뒤**에 원하는 **월 평균 수령액**을 받기 위한 플랜입니다.")
-        
-        target_monthly_div_input = st.number_input("목표 월 배당금 (만원)", value=100, step=10, help="세후 기준으로 매달(혹은 월 환산으로) 받고 싶은 금액")
-        
-        if st.button("🧮 필요 자금 및 월 적립액 계산", type="primary"):
-            future_months = years * 12
-            
-            # 미래 주가 및 배당 예측 (월 추세 반영)
-            decay_factor = (1 + real_change_rate/100) ** future_months
-            est_future_price = price_krw * decay_factor
-            
-            # 미래의 '연간' 배당금 예측 (주당)
-            current_annual_dps = annual_div_usd * rate
-            est_future_annual_dps = current_annual_dps * decay_factor
-            
-            # 목표 금액 (월 * 12 = 연간 목표 배당금)
-            target_annual_div_won = target_monthly_div_input * 10000 * 12
-            
-            if est_future_annual_dps <= 0:
-                 st.error("⚠️ 예상 배당금이 0원이 되어 계산할 수 없습니다. 주가 하락률을 조정하세요.")
-            else:
-                # 필요 주식 수 = 연간 목표 배당금 / (미래의 주당 연배당금 * 세후)
-                needed_shares = target_annual_div_won / (est_future_annual_dps * (1 - tax_rate/100))
-                needed_asset_future = needed_shares * est_future_price
-                
-                # 월 수익률 계산 (Total Return)
-                # 월 환산 배당수익률
-                monthly_yield_rate = (current_annual_dps / 12) / price_krw * 100
-                total_monthly_return_rate = (real_change_rate + monthly_yield_rate) / 100
-                
-                # 적립액 계산 (연금 미래가치 역산 공식)
-                if total_monthly_return_rate == 0:
-                    monthly_savings_needed = needed_asset_future / future_months
-                else:
-                    monthly_savings_needed = needed_asset_future * total_monthly_return_rate / ((1 + total_monthly_return_rate)**future_months - 1)
-                
-                st.divider()
-                st.markdown(f"""
-                <div style="text-align: center; padding: 25px; background-color: #f0f7ff; border-radius: 15px; border: 2px solid #3b82f6; margin-bottom: 20px;">
-                    <div style="color: #6b7280; font-size: 1.1rem; margin-bottom: 5px;">{years}년 뒤, 월 {target_monthly_div_input}만원(연 {target_monthly_div_input*12:,}만원)을 받으려면</div>
-                    <div style="color: #1d4ed8; font-size: 2.5rem; font-weight: bold;">{needed_asset_future/10000:,.0f} 만원</div>
-                    <div style="color: #6b7280; font-size: 0.9rem;">만큼의 계좌 잔고(평가금)가 있어야 합니다.</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown(f"""
-                <div style="text-align: center; padding: 25px; background-color: #fff1f2; border-radius: 15px; border: 2px solid #e11d48;">
-                    <div style="color: #6b7280; font-size: 1.1rem; margin-bottom: 5px;">🔥 당장 이번 달부터</div>
-                    <div style="color: #be123c; font-size: 2.5rem; font-weight: bold;">월 {monthly_savings_needed/10000:,.0f} 만원씩</div>
-                    <div style="color: #6b7280; font-size: 0.9rem;">종목을 매수하고 배당을 재투자해야 합니다.</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                with st.expander("📌 참고: 배당 주기에 따른 실제 수령액"):
-                    per_payout_target = (target_monthly_div_input * 12) / selected_freq["count"]
-                    st.write(f"현재 **{div_freq_option}** 설정을 기준으로 하면, 목표 달성 시")
-                    st.write(f"**{selected_freq['desc']}** 때마다 **약 {per_payout_target:,.0f} 만원 (세후)** 씩 입금됩니다.")
+        render_tab2(div_freq_option, selected_freq, price_krw, annual_div_usd * rate, tax_rate, real_change_rate, years)
 
 except Exception as e:
     st.error("데이터를 불러오는 중 오류가 발생했습니다. 티커를 확인하거나 잠시 후 다시 시도해주세요.")